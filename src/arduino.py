@@ -0,0 +1,196 @@
+import serial, time, sys, threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+
+# serial driver for the Arduino, kept apart from backend so it can be used without the camera stack
+# tweak constants here to suit the Arduino connection
+DEFAULT_ARDUINO_PORT = "/dev/ttyUSB0"
+ACK_TIMEOUT       = 1 # seconds for the Arduino to report a command as received before it is resent
+COMMAND_RETRIES   = 3
+MOVE_TIMEOUTS     = {"x": 3, "y": 3, "z": 3, "l": 15} # seconds for one step, a lens change takes about 8
+HANDSHAKE_TIMEOUT = 5
+WAIT_TIMEOUT      = 60 # fallback for callers in case commands stop being resolved
+
+
+# a command sent to the Arduino that has not been reported as done yet
+class Command():
+    def __init__(self, instruction, motor, on_done=None):
+        self.instruction = instruction
+        self.motor = motor
+        self.on_done = on_done
+        self.future = Future()
+        self.sent = time.monotonic()
+        self.received = None
+        self.attempts = 1
+
+
+# the purpose of the Arduino is to control the stepper motors
+class Arduino():
+    def __init__(self):
+        self.arduino_device = None
+        self.arduino_initialised = False
+        self.arduino_failed = False # set once a command is given up, cleared by reconnecting
+        self.reader_thread = None
+        self.serial_lock = threading.Lock()
+        self.pending = {} # seq -> Command
+        self.seq = 0
+
+    # we used "/dev/ttyUSB0" as our default port for our set up
+    def initialise_arduino(self, port=DEFAULT_ARDUINO_PORT):
+        if self.arduino_initialised: 
+            sys.exit("Arduino already connected, please disconnect Arduino first before making new connection.")
+
+        self.arduino_device = serial.Serial(port, 9600, timeout=1)
+        self.arduino_device.reset_input_buffer()
+        if not self.handshake():
+            self.arduino_device.close()
+            self.arduino_device = None
+            sys.exit("Arduino did not respond to handshake.")
+
+        self.seq = 0
+        self.arduino_failed = False
+        self.arduino_initialised = True
+        self.reader_thread = threading.Thread(target=self.read_replies, daemon=True)
+        self.reader_thread.start()
+        print("Arduino connected.")
+
+    # the Arduino may reset when the port is opened, keep asking until it has booted and
+    # cleared its sequence number so new commands are never mistaken for resends
+    def handshake(self):
+        deadline = time.monotonic() + HANDSHAKE_TIMEOUT
+        while time.monotonic() < deadline:
+            self.arduino_device.write(b"reset\n")
+            response = self.arduino_device.readline().decode("utf-8", errors="ignore").strip()
+            if response == "Ready": return True
+        return False
+
+    def deinitialise_arduino(self):
+        if not self.arduino_initialised: 
+            sys.exit("Arduino not connected, unable to disconnect.")
+
+        self.arduino_initialised = False
+        self.reader_thread.join()
+        self.reader_thread = None
+        self.arduino_device.close()
+        self.arduino_device = None
+        print("Arduino disconnected.")
+
+    # instructions are tagged with a sequence number which the Arduino echoes back in its replies,
+    # resends reuse the same number so the Arduino can acknowledge them without moving twice
+    # on_done runs before the future resolves so position tracking is up to date for the caller
+    def send_async(self, motor, direction, on_done=None):
+        if not self.arduino_initialised: 
+            sys.exit("Arduino not connected, unable to move motors.")
+        if self.arduino_failed:
+            sys.exit("Arduino stopped responding, please reconnect the Arduino.")
+        if not self.reader_thread.is_alive():
+            sys.exit("Arduino reader stopped, please reconnect the Arduino.")
+
+        with self.serial_lock:
+            self.seq += 1
+            command = Command(f"{self.seq} {motor} {direction}\n".encode("utf-8"), motor, on_done)
+            self.pending[self.seq] = command
+            self.write(command.instruction)
+        return command.future
+
+    def wait(self, future):
+        try:
+            future.result(timeout=WAIT_TIMEOUT)
+        except (TimeoutError, FutureTimeoutError, ConnectionError) as e:
+            sys.exit(str(e) or f"Arduino command not finished after {WAIT_TIMEOUT} seconds.")
+
+    # send instruction to Arduino to make it move a specific motor in a certain direction
+    def send(self, motor, direction):
+        self.wait(self.send_async(motor, direction))
+
+    def write(self, instruction):
+        try:
+            self.arduino_device.write(instruction)
+        except (serial.SerialException, OSError) as e:
+            print(f"Unable to write to Arduino: {e}")
+
+    # runs on the reader thread, any command still pending when it stops is failed
+    # so callers never wait on a reply that cannot arrive
+    def read_replies(self):
+        try:
+            while self.arduino_initialised:
+                try:
+                    response = self.arduino_device.readline().decode("utf-8", errors="ignore").strip()
+                except (serial.SerialException, OSError) as e:
+                    print(f"Unable to read from Arduino: {e}")
+                    time.sleep(1)
+                    response = ""
+                self.handle_reply(response)
+                self.check_timeouts()
+        finally:
+            with self.serial_lock:
+                for command in self.pending.values():
+                    command.future.set_exception(ConnectionError("Arduino disconnected before command finished."))
+                self.pending.clear()
+
+    # replies are "Received <seq>" as soon as a command is read and "Done <seq>" once the move finishes
+    def handle_reply(self, response):
+        try:
+            reply, seq = response.split()
+            seq = int(seq)
+        except ValueError:
+            return
+
+        with self.serial_lock:
+            command = self.pending.get(seq)
+            if command is None: return
+            if reply == "Received":
+                command.received = time.monotonic()
+                return
+            if reply != "Done": return
+            del self.pending[seq]
+            self.restart_timer()
+        if command.on_done is not None: command.on_done()
+        command.future.set_result(None)
+
+    # the Arduino works through commands in order, so only the oldest pending command is timed,
+    # and its timer starts once the command before it has finished
+    def restart_timer(self):
+        if self.pending:
+            command = self.pending[min(self.pending)]
+            if command.received is None: command.sent = time.monotonic()
+
+    # a command is resent if it was never received or its move overran, the Arduino acknowledges
+    # a resend of a command it already carried out without moving again
+    def check_timeouts(self):
+        with self.serial_lock:
+            if not self.pending: return
+            seq = min(self.pending)
+            command = self.pending[seq]
+            now = time.monotonic()
+            if command.received is None:
+                if now - command.sent < ACK_TIMEOUT: return
+            elif now - command.received < MOVE_TIMEOUTS[command.motor]: return
+
+            # the Arduino never reached this seq and ignores anything after it, so every later
+            # command fails too and no more are accepted until the handshake is redone
+            if command.attempts > COMMAND_RETRIES:
+                self.arduino_failed = True
+                error = f"Arduino did not finish {command.instruction.decode('utf-8').rstrip()}"
+                for pending in self.pending.values():
+                    pending.future.set_exception(TimeoutError(error))
+                self.pending.clear()
+                return
+
+            self.write(command.instruction)
+            command.sent = now
+            command.received = None
+            command.attempts += 1
+
+    # move motors by chosen steps in chosen direction
+    def move_x(self, steps, direction):
+        for _ in range(steps): self.send("x", direction)
+
+    def move_y(self, steps, direction):
+        for _ in range(steps): self.send("y", direction)
+
+    def move_z(self, steps, direction):
+        for _ in range(steps): self.send("z", direction)
+
+    def move_lens(self, steps, direction):
+        for _ in range(steps): self.send("l", direction)
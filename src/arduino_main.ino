@@ -96,13 +96,38 @@ void move_motor(String instruction) {
       l_stepper.move(-1*l_steps);
     }
   }
-  Serial.println("Done");
 }
 
+// sequence number of the last instruction carried out, cleared by the "reset" handshake
+unsigned long last_seq = 0;
+
 void loop() {
   if (Serial.available() > 0) {
+    // instructions are "<seq> <motor> <direction>", seq increases by one with every new instruction
     String instruction = Serial.readStringUntil('\n');
-    move_motor(instruction);
+    instruction.trim();
+
+    // the pi starts every connection with "reset" so its seq and last_seq start from 0 together
+    if (instruction == "reset") {
+      last_seq = 0;
+      Serial.println("Ready");
+      return;
+    }
+
+    int split = instruction.indexOf(' ');
+    unsigned long seq = instruction.substring(0, split).toInt();
+
+    // a seq past the next one means an instruction was lost, ignore it and wait for the resend
+    if (seq > last_seq + 1) return;
+
+    Serial.print("Received ");
+    Serial.println(seq);
+    // an old seq is a resend after a slow reply, acknowledge it again without moving
+    if (seq == last_seq + 1) {
+      move_motor(instruction.substring(split + 1));
+      last_seq = seq;
+    }
+    Serial.print("Done ");
+    Serial.println(seq);
   }
 }
-
@@ -1,5 +1,7 @@
-import serial, time, os, cv2, sys
+import time, os, cv2, sys, glob, shutil
 import numpy as np
+from arduino import Arduino, DEFAULT_ARDUINO_PORT
+from focus_stack import FocusStacker, z_stack_window
 from picamera2 import Picamera2
 from libcamera import controls
 from tqdm import tqdm
@@ -9,7 +11,6 @@ from pydrive2.drive import GoogleDrive
 
 # tweak constants here to suit Autoscope and environment (exposure)
 # input drive folder ids before running count_cells method in Autoscope
-DEFAULT_ARDUINO_PORT = "/dev/ttyUSB0"
 X4_EXPOSURE_TIME  = 100_000
 X10_EXPOSURE_TIME = 500_000
 X40_EXPOSURE_TIME = 3_000_000
@@ -18,6 +19,10 @@ BOTTOM_LIMIT      = 50
 TEMP_FOLDER_PATH  = "./TEMP"
 DATA_FOLDER_PATH  = "./DATA"
 FOCUS_PATH        = "./TEMP/FOCUS.jpg"
+FUSED_PATH        = "./TEMP/FUSED.jpg"
+Z_PLANE_PATH      = "./TEMP/Z_{:0>2}.jpg" # one file per plane of the 40x focus sweep
+Z_PLANE_GLOB      = "./TEMP/Z_*.jpg"
+Z_STACK_PLANES    = 5 # planes fused around best focus at 40x, 0 turns z-stacking off
 SQUARE_GRID_PICTURES_PATHS = ["",
                               "./TEMP/1.jpg", "./TEMP/2.jpg", "./TEMP/3.jpg", 
                               "./TEMP/4.jpg", "./TEMP/5.jpg", "./TEMP/6.jpg", 
@@ -26,59 +31,6 @@ DRIVE_INPUT_FOLDER_ID  = "1d2YUfW8d4tL57rssurazZXXzqD_GaEK8"
 DRIVE_OUTPUT_FOLDER_ID = "1YPrlwGlUEjJe-BMzjESk201zpbyNCwLQ"
 
 
-# the purpose of the Arduino is to control the stepper motors
-class Arduino():
-    def __init__(self):
-        self.arduino_device = None
-        self.arduino_initialised = False
-
-    # we used "/dev/ttyUSB0" as our default port for our set up
-    def initialise_arduino(self, port=DEFAULT_ARDUINO_PORT):
-        if self.arduino_initialised: 
-            sys.exit("Arduino already connected, please disconnect Arduino first before making new connection.")
-
-        self.arduino_device = serial.Serial(port, 9600, timeout=1)
-        self.arduino_device.reset_input_buffer()
-        # add hand shake here to ensure arduino is connected
-        self.arduino_initialised = True
-        print("Arduino connected.")
-
-    def deinitialise_arduino(self):
-        if not self.arduino_initialised: 
-            sys.exit("Arduino not connected, unable to disconnect.")
-
-        self.arduino_device.close()
-        self.arduino_device = None
-        self.arduino_initialised = False
-        print("Arduino disconnected.")
-
-    # send instruction to Arduino to make it move a specific motor in a certain direction
-    # finetuning should be done in this step with time.sleep() to significantly speed up the Autoscope
-    def send(self, motor, direction):
-        if not self.arduino_initialised: 
-            sys.exit("Arduino not connected, unable to move motors.")
-
-        response = "Not done"
-        while response != "Done":
-            instruction = f"{motor} {direction}\n"
-            self.arduino_device.write(instruction.encode("utf-8"))
-            time.sleep(1)
-            response = self.arduino_device.readline().decode("utf-8").rstrip()
-
-    # move motors by chosen steps in chosen direction
-    def move_x(self, steps, direction):
-        for _ in range(steps): self.send("x", direction)
-
-    def move_y(self, steps, direction):
-        for _ in range(steps): self.send("y", direction)
-
-    def move_z(self, steps, direction):
-        for _ in range(steps): self.send("z", direction)
-
-    def move_lens(self, steps, direction):
-        for _ in range(steps): self.send("l", direction)
-
-
 class Camera():
     def __init__(self):
         self.camea_device = None
@@ -145,6 +97,9 @@ class Autoscope(Arduino, Camera):
         self.y_position = 0
         self.z_position = 0
         self.median_area = 5 # take center of sample as default
+        self.z_stack_planes = Z_STACK_PLANES
+        self.sweep_range = None # (lowest z, highest z) of the planes saved by the last 40x sweep
+        self.fused_position = None # (x, y, z, zoom) the fused image was taken at
 
     def initialise(self, arduino_port=DEFAULT_ARDUINO_PORT):
         self.initialise_arduino(arduino_port)
@@ -184,8 +139,21 @@ class Autoscope(Arduino, Camera):
         else:
             self.z_position -= steps
     
+    # starts a single z step, z_position is updated before the returned future resolves
+    def smart_move_z_async(self, direction):
+        return self.send_async("z", direction, on_done=lambda: self.count_z_step(direction))
+
+    def count_z_step(self, direction):
+        if direction == "+":
+            self.z_position += 1
+        else:
+            self.z_position -= 1
+
     def set_current_zoom(self, zoom):
         self.current_zoom = zoom
+
+    def set_z_stack_planes(self, planes):
+        self.z_stack_planes = planes
     
     def set_exposure(self):
         if not self.camera_initialised: 
@@ -211,7 +179,7 @@ class Autoscope(Arduino, Camera):
         if self.current_zoom in ["4x", "10x"]:
             self.focus_4x_10x()
         elif self.current_zoom == "40x":
-            self.focus_40x()
+            self.focus_40x(self.z_stack_planes)
         else:
             sys.exit("Unrecognised zoom level.")
 
@@ -238,22 +206,35 @@ class Autoscope(Arduino, Camera):
         self.stop_camera()
         print("Focusing complete")
 
-    def focus_40x(self):
+    # every plane of the sweep is kept on disk so a z-stack can be fused afterwards
+    # without moving the stage again, z_stack_planes=0 keeps only the best plane
+    def focus_40x(self, z_stack_planes=0):
         print(f"Focusing at {self.current_zoom}")
         self.start_camera()
-        self.capture(FOCUS_PATH)
-        current_sharpness = self.calculate_sharpness()
-        best = [self.z_position, current_sharpness]
-        print(f"{'{:0>2}'.format(best[0])}: {best[1]}")
+        # planes left over from an earlier sweep must not end up in this z-stack
+        for filepath in glob.glob(Z_PLANE_GLOB): os.remove(filepath)
+        self.sweep_range = None
 
-        while self.z_position > TOP_LIMIT:
-            self.smart_move_z(1, "-")
-            self.capture(FOCUS_PATH)
-            current_sharpness = self.calculate_sharpness()
-            print(f"{'{:0>2}'.format(self.z_position)}: {current_sharpness}")
+        start_z = self.z_position
+        best = [self.z_position, -1]
+        self.capture(Z_PLANE_PATH.format(self.z_position))
+
+        # the next step is started before the captured plane is measured so the stage moves
+        # while the sharpness is being calculated
+        # z_position changes once the move finishes, so the plane being measured is kept separately
+        while True:
+            plane_z = self.z_position
+            move = self.smart_move_z_async("-") if plane_z > TOP_LIMIT else None
+            current_sharpness = self.calculate_sharpness(Z_PLANE_PATH.format(plane_z))
+            print(f"{'{:0>2}'.format(plane_z)}: {current_sharpness}")
             if current_sharpness > best[1]:
-                best = [self.z_position, current_sharpness]
+                best = [plane_z, current_sharpness]
+            if move is None: break
+
+            self.wait(move)
+            self.capture(Z_PLANE_PATH.format(self.z_position))
         
+        self.sweep_range = (self.z_position, start_z)
         return_steps = best[0] - self.z_position
         self.smart_move_z(return_steps, "+")
         self.capture(FOCUS_PATH)
@@ -261,9 +242,41 @@ class Autoscope(Arduino, Camera):
         self.stop_camera()
         print("Focusing complete")
 
+        if z_stack_planes > 0:
+            self.fuse_z_stack(best[0], z_stack_planes)
+
+    # fuse the sweep planes centred on best_z, limited to the range of the last sweep
+    def fuse_z_stack(self, best_z, planes=Z_STACK_PLANES):
+        if self.sweep_range is None:
+            sys.exit("No focus sweep to fuse, focus at 40x first.")
+
+        lowest_z, highest_z = self.sweep_range
+        first_z, last_z = z_stack_window(best_z, planes, lowest_z, highest_z)
+
+        stacker = FocusStacker()
+        for z in range(first_z, last_z + 1):
+            image = cv2.imread(Z_PLANE_PATH.format(z))
+            if image is None:
+                sys.exit(f"Unable to read plane {z} of the focus sweep, z-stack not fused.")
+            stacker.add(image)
+
+        cv2.imwrite(FUSED_PATH, stacker.result())
+        self.fused_position = self.current_position()
+        print(f"Z-stack of {stacker.planes} planes ({first_z} to {last_z}) fused to {FUSED_PATH}")
+
+    def current_position(self):
+        return (self.x_position, self.y_position, self.z_position, self.current_zoom)
+
+    # the fused image is saved while the stage is still where it was focused, otherwise a new picture is taken
+    def save_image(self, filepath):
+        if self.fused_position == self.current_position():
+            shutil.copyfile(FUSED_PATH, filepath)
+        else:
+            self.capture(filepath)
+
     # Tenengrad method
-    def calculate_sharpness(self):
-        image = cv2.imread(FOCUS_PATH)
+    def calculate_sharpness(self, filepath=FOCUS_PATH):
+        image = cv2.imread(filepath)
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
         gx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
@@ -392,7 +405,7 @@ class Autoscope(Arduino, Camera):
         elif self.current_zoom == "10x":
             self.move_lens(1, "-")
             self.current_zoom = "40x"
-            self.focus_40x()
+            self.focus_40x(self.z_stack_planes)
         elif self.current_zoom == "40x":
             self.move_lens(1, "-")
             self.current_zoom = "10x"
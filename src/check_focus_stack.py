@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+from focus_stack import FocusStacker, z_stack_window
+
+
+# synthetic checks for the z-stack fusion, run with python check_focus_stack.py
+# margin keeps the comparisons clear of the seam where the focus measure is blurred across halves
+def textured_image(size=128):
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 200, (size, size, 3), dtype=np.uint8)
+
+
+def check_sharp_halves(margin=16):
+    sharp = textured_image()
+    blurred = cv2.GaussianBlur(sharp, (15, 15), 5)
+    half = sharp.shape[1] // 2
+    left_sharp = blurred.copy()
+    left_sharp[:, :half] = sharp[:, :half]
+    right_sharp = blurred.copy()
+    right_sharp[:, half:] = sharp[:, half:]
+
+    stacker = FocusStacker()
+    stacker.add(left_sharp)
+    stacker.add(right_sharp)
+    fused = stacker.result()
+
+    assert fused.shape == sharp.shape and fused.dtype == sharp.dtype
+    assert np.array_equal(fused[:, :half - margin], sharp[:, :half - margin])
+    assert np.array_equal(fused[:, half + margin:], sharp[:, half + margin:])
+    assert np.array_equal(stacker.best_focus,
+                          np.maximum(stacker.focus_measure(left_sharp), stacker.focus_measure(right_sharp)))
+    print("Fused image takes the sharp half of each plane.")
+
+
+# a brightness offset leaves the laplacian unchanged, so both planes are equally sharp everywhere
+def check_first_plane_wins():
+    first = textured_image()
+    second = first + 50
+
+    stacker = FocusStacker()
+    stacker.add(first)
+    stacker.add(second)
+
+    assert np.array_equal(stacker.result(), first)
+    assert stacker.planes == 2
+    print("Equally sharp pixels are kept from the first plane.")
+
+
+# the 40x sweep goes from the starting z down to TOP_LIMIT
+def check_window_clamping(top_limit=35, start_z=50):
+    assert z_stack_window(42, 5, top_limit, start_z) == (40, 44)
+    assert z_stack_window(42, 4, top_limit, start_z) == (40, 43)
+    assert z_stack_window(top_limit, 5, top_limit, start_z) == (35, 39)
+    assert z_stack_window(start_z, 5, top_limit, start_z) == (46, 50)
+    assert z_stack_window(49, 5, 48, 50) == (48, 50)
+    assert z_stack_window(top_limit, 1, top_limit, top_limit) == (35, 35)
+    print("Z-stack window stays within the sweep.")
+
+
+if __name__ == "__main__":
+    check_sharp_halves()
+    check_first_plane_wins()
+    check_window_clamping()
@@ -0,0 +1,184 @@
+import time, queue, threading, sys, importlib
+from unittest import mock
+import arduino
+from arduino import Arduino
+
+
+# stand-in for serial.Serial that behaves like arduino_main.ino, used to check and benchmark
+# the serial driver without the Autoscope hardware
+# move_time is how long a single step takes, drop_replies drops the next "Done" replies
+# and setting dead stops it answering anything
+class FakeArduinoSerial():
+    def __init__(self, port=None, baudrate=9600, timeout=1, move_time=0.05):
+        self.timeout = timeout
+        self.move_time = move_time
+        self.drop_replies = 0
+        self.dead = False
+        self.moves = []
+        self.last_seq = 0
+        self.instructions = queue.Queue()
+        self.replies = queue.Queue()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def reset_input_buffer(self):
+        pass
+
+    def write(self, data):
+        self.instructions.put(data.decode("utf-8"))
+
+    def readline(self):
+        try:
+            return self.replies.get(timeout=self.timeout)
+        except queue.Empty:
+            return b""
+
+    def close(self):
+        pass
+
+    def reply(self, line):
+        self.replies.put(f"{line}\r\n".encode("utf-8"))
+
+    # same handling of instructions as loop() in arduino_main.ino
+    def run(self):
+        while True:
+            instruction = self.instructions.get().strip()
+            if self.dead: continue
+            if instruction == "reset":
+                self.last_seq = 0
+                self.reply("Ready")
+                continue
+
+            seq, move = instruction.split(" ", 1)
+            seq = int(seq)
+            if seq > self.last_seq + 1: continue
+
+            self.reply(f"Received {seq}")
+            if seq == self.last_seq + 1:
+                time.sleep(self.move_time)
+                self.moves.append(move)
+                self.last_seq = seq
+            if self.drop_replies > 0:
+                self.drop_replies -= 1
+                continue
+            self.reply(f"Done {seq}")
+
+
+def connect(driver, device=None):
+    with mock.patch("arduino.serial.Serial", lambda *args, **kwargs: device or FakeArduinoSerial(*args, **kwargs)):
+        driver.initialise_arduino("fake")
+    return driver.arduino_device
+
+
+def check_dropped_reply():
+    driver = Arduino()
+    device = connect(driver)
+    device.drop_replies = 1
+    for _ in range(5): driver.send("z", "-")
+    driver.deinitialise_arduino()
+    assert device.moves == ["z -"] * 5, device.moves
+    print("Dropped reply resent without a double move.")
+
+
+def check_bad_bytes():
+    driver = Arduino()
+    device = connect(driver)
+    device.replies.put(b"\xf0\r\n")
+    device.replies.put(b"Done x\r\n")
+    driver.send("x", "+")
+    assert driver.reader_thread.is_alive()
+    driver.deinitialise_arduino()
+    print("Reader survived bad bytes.")
+
+
+def check_dead_link():
+    driver = Arduino()
+    device = connect(driver)
+    device.dead = True
+    start = time.monotonic()
+    move = driver.send_async("y", "+")
+    assert isinstance(move.exception(timeout=arduino.WAIT_TIMEOUT), TimeoutError)
+    print(f"Dead link timed out after {time.monotonic() - start:.1f}s.")
+    driver.deinitialise_arduino()
+
+
+def check_disconnect():
+    driver = Arduino()
+    device = connect(driver)
+    device.dead = True
+    move = driver.send_async("y", "+")
+    driver.deinitialise_arduino()
+    assert isinstance(move.exception(timeout=1), ConnectionError)
+    print("Pending command failed on disconnect.")
+
+
+def check_recovery():
+    driver = Arduino()
+    device = connect(driver)
+    device.dead = True
+    assert isinstance(driver.send_async("y", "+").exception(timeout=arduino.WAIT_TIMEOUT), TimeoutError)
+    device.dead = False
+    try:
+        driver.send_async("y", "+")
+        assert False, "command accepted after the Arduino stopped responding"
+    except SystemExit:
+        pass
+
+    driver.deinitialise_arduino()
+    connect(driver, device)
+    driver.send("y", "+")
+    driver.deinitialise_arduino()
+    assert device.moves == ["y +"], device.moves
+    print("Commands refused after a timeout until the Arduino was reconnected.")
+
+
+# focus_40x lives in backend which needs the camera stack, the benchmark replaces every camera
+# call so stand-ins are used for any camera or drive module that is not installed
+def import_backend():
+    for name in ["picamera2", "libcamera", "tqdm", "pydrive2", "pydrive2.auth", "pydrive2.drive"]:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            sys.modules[name] = mock.MagicMock()
+    return importlib.import_module("backend")
+
+
+# times focus_40x with the next move started before the sharpness calculation,
+# and with every move waited on before it returns as the old blocking send did
+def benchmark_focus_40x(capture_time=0.05, sharpness_time=0.2, move_time=0.2):
+    backend = import_backend()
+    timings = {}
+    for mode in ["sequential", "pipelined"]:
+        autoscope = backend.Autoscope()
+        connect(autoscope)
+        autoscope.arduino_device.move_time = move_time
+        autoscope.current_zoom = "40x"
+        autoscope.z_position = backend.BOTTOM_LIMIT
+        autoscope.start_camera = lambda: None
+        autoscope.stop_camera = lambda: None
+        autoscope.capture = lambda filepath: time.sleep(capture_time)
+        autoscope.calculate_sharpness = lambda filepath=None: time.sleep(sharpness_time) or 0
+
+        if mode == "sequential":
+            send_async = autoscope.send_async
+            def blocking_send(motor, direction, on_done=None, send_async=send_async):
+                move = send_async(motor, direction, on_done)
+                move.result()
+                return move
+            autoscope.send_async = blocking_send
+
+        start = time.monotonic()
+        autoscope.focus_40x(z_stack_planes=0)
+        timings[mode] = time.monotonic() - start
+        autoscope.deinitialise_arduino()
+
+    steps = backend.BOTTOM_LIMIT - backend.TOP_LIMIT
+    print(f"focus_40x over {steps} steps: sequential {timings['sequential']:.2f}s, pipelined {timings['pipelined']:.2f}s")
+
+
+if __name__ == "__main__":
+    check_dropped_reply()
+    check_bad_bytes()
+    check_dead_link()
+    check_disconnect()
+    check_recovery()
+    benchmark_focus_40x()
@@ -0,0 +1,43 @@
+import cv2, sys
+import numpy as np
+
+
+# extended depth of field fusion, planes are added one at a time so only the fused
+# image and its focus map are kept in memory instead of the whole z-stack
+class FocusStacker():
+    def __init__(self, blur_size=9):
+        self.blur_size = blur_size
+        self.fused = None
+        self.best_focus = None
+        self.planes = 0
+
+    # per pixel focus measure, smoothed absolute laplacian
+    def focus_measure(self, image):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        laplacian = np.abs(cv2.Laplacian(gray, cv2.CV_32F, ksize=3))
+        return cv2.GaussianBlur(laplacian, (self.blur_size, self.blur_size), 0)
+
+    # keep each pixel from whichever plane has been sharpest there so far
+    def add(self, image):
+        measure = self.focus_measure(image)
+        if self.fused is None:
+            self.fused = image.copy()
+            self.best_focus = measure
+        else:
+            sharper = measure > self.best_focus
+            self.fused[sharper] = image[sharper]
+            np.maximum(self.best_focus, measure, out=self.best_focus)
+        self.planes += 1
+
+    def result(self):
+        if self.fused is None:
+            sys.exit("No planes added to focus stack.")
+        return self.fused
+
+
+# first and last z of a z-stack of planes centred on best_z, shifted to stay within
+# the lowest_z to highest_z range that was swept
+def z_stack_window(best_z, planes, lowest_z, highest_z):
+    first_z = min(max(lowest_z, best_z - planes // 2), max(lowest_z, highest_z - planes + 1))
+    last_z = min(highest_z, first_z + planes - 1)
+    return first_z, last_z
@@ -144,7 +144,7 @@ class AutoWindow(QWidget):
     def save_image(self):
         filename = input("Enter name for image.")
         filepath = os.path.join(DATA_FOLDER_PATH, filename)
-        self.autoscope.capture(filename)
+        self.autoscope.save_image(filepath)
 
     def create_manual_menu(self):
         self.manual = ManualWindow(self.autoscope)
@@ -188,7 +188,7 @@ class ManualWindow(QWidget):
         elif event.key() == Qt.Key_F:
             filename = input("Enter image name here: ")
             filepath = os.path.join(DATA_FOLDER_PATH, filename)
-            self.autoscope.capture()
+            self.autoscope.save_image(filepath)
         elif event.key() == Qt.Key_Escape:
             self.close()
 
@@ -245,4 +245,4 @@ class SaveImageWindow(QWidget):
             self.close()
 
     def save_image(self):
-        self.autoscope.capture(self.filepath)
+        self.autoscope.save_image(self.filepath)